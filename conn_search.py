@@ -10,7 +10,17 @@ from processing_filtering import (filter_most_common_conns, remove_pronouns,
                                   filter_unlikely_alignments,
                                   remove_incomplete_phrases,
                                   filter_single_words, remove_punct_values)
-from parse_all_alignments import parse_phrase_alignments, parse_discontinuous
+from parse_all_alignments import (parse_phrase_alignments, parse_discontinuous,
+                                  BUFFER_SIZE)
+
+# Connectives with inaccurate alignment
+_FR_DEL = frozenset(["dire que", "dire qu'", "et dire que", "et dire qu'",
+                     "encore que", "cependant que", "cependant qu'",
+                     "encore qu'", "si", "s'", "en même temps que",
+                     "en même temps qu'"])
+_DE_DEL = frozenset(["bloß", "dabei", "mangels", "mithin", "obschon",
+                     "wenn ... auch", "wiederum", "wobei", "wohingegen",
+                     "als ob"])
 
 
 class FindAlignments:
@@ -68,6 +78,20 @@ class FindAlignments:
         German alignments (unfiltered, as counts)
     fr_count : dict
         French alignments (unfiltered, as counts)
+    _phrase_cache : dict
+        Phrase alignments that were already parsed, per language
+    _discont_cache : dict
+        Discontinuous phrase alignments that were already parsed, per
+        language
+    _corpus_tokens : dict
+        The tokens of the German (1) and French (2) corpus
+    _fr_lex_set : set
+        The same connectives as fr_lex for fast membership tests
+    _de_lex_set : set
+        The same connectives as de_lex for fast membership tests
+    _lang_params : dict
+        The alignments, lexicons and counts used for each source
+        language
     """
 
     def __init__(self, de_alignment_file, fr_alignment_file, alignment,
@@ -80,6 +104,8 @@ class FindAlignments:
         self.french_corpus = french_corpus
         self.fr_lex = fr_lex
         self.de_lex = de_lex
+        self._fr_lex_set = set(fr_lex)
+        self._de_lex_set = set(de_lex)
         self.all_de_conns = all_de_conns
         self.all_fr_conns = all_fr_conns
         self.counter = 0
@@ -87,6 +113,79 @@ class FindAlignments:
         self.fr_conn_alignments = dict()
         self.de_count = dict()
         self.fr_count = dict()
+        self._phrase_cache = {1: dict(), 2: dict()}
+        self._discont_cache = {1: dict(), 2: dict()}
+        self._corpus_tokens = dict()
+        # Settings for a round with French or German as source language
+        self._lang_params = {
+            "french": dict(alignments=self.fr_de, count_dict=self.fr_count,
+                           lang_pos=2, other_lang="german", lex=self.fr_lex,
+                           del_conns=_FR_DEL, other_lex=self._de_lex_set,
+                           complete_lex=self.all_de_conns),
+            "german": dict(alignments=self.de_fr, count_dict=self.de_count,
+                           lang_pos=1, other_lang="french", lex=self.de_lex,
+                           del_conns=_DE_DEL, other_lex=self._fr_lex_set,
+                           complete_lex=self.all_fr_conns)}
+
+    def _get_corpus_tokens(self, lang_pos):
+        """Returns all tokens of a corpus, the corpus is only read once
+
+        Parameters
+        ----------
+        lang_pos : int
+            1 for the German corpus, 2 for the French corpus
+
+        Returns
+        -------
+        tokens : set
+            The set of all tokens in the corpus
+        """
+
+        if lang_pos not in self._corpus_tokens:
+            corpus = self.german_corpus if lang_pos == 1\
+                else self.french_corpus
+            tokens = set()
+            with open(corpus, "r", encoding="utf-8",
+                      buffering=BUFFER_SIZE) as sentences:
+                for sentence in sentences:
+                    tokens.update(sentence.split())
+            self._corpus_tokens[lang_pos] = tokens
+
+        return self._corpus_tokens[lang_pos]
+
+    def _parse_cached(self, parse, cache, phrases, lang_pos):
+        """Parses the alignments of phrases that were not parsed in a
+        previous round
+
+        Parameters
+        ----------
+        parse : function
+            parse_phrase_alignments or parse_discontinuous
+        cache : dict
+            The alignments of the phrases that were already parsed
+        phrases : list
+            The phrases of the current lexicon
+        lang_pos : int
+            Whether the phrases correspond to language 1 or 2
+
+        Returns
+        -------
+        phrase_alignments : dict
+            A dictionary with the alignments for the phrases
+        """
+
+        missing = [phrase for phrase in phrases if phrase not in cache]
+        if missing:
+            parsed = parse(self.alignment, self.german_corpus,
+                           self.french_corpus, missing, lang=lang_pos)
+            # Phrases without any occurrence are cached as well
+            for phrase in missing:
+                cache[phrase] = parsed.get(phrase, [])
+
+        phrase_alignments = {phrase: cache[phrase] for phrase in phrases
+                             if cache[phrase]}
+
+        return phrase_alignments
 
     def find_conns(self, lex=[], lang="german", word_threshold=0.02,
                    phrase_threshold=0.02, word_min_count=20,
@@ -115,117 +214,105 @@ class FindAlignments:
         None
         """
 
-        self.counter += 1
+        while True:
+            self.counter += 1
 
-        if lang == "french":
-            alignments = self.fr_de
-            count_dict = self.fr_count
-            lang_pos = 2
-            other_lang = "german"
-            if not lex:
-                lex = self.fr_lex
-            # Delete connectives with inaccurate alignment
-            fr_del = ["dire que", "dire qu'", "et dire que", "et dire qu'",
-                      "encore que", "cependant que", "cependant qu'",
-                      "encore qu'", "si", "s'",
-                      "en même temps que", "en même temps qu'"]
-            lex = [conn for conn in lex if conn not in fr_del]
-
-            other_lex = self.de_lex
-            complete_lex = self.all_de_conns
-        elif lang == "german":
-            alignments = self.de_fr
-            count_dict = self.de_count
-            lang_pos = 1
-            other_lang = "french"
+            params = self._lang_params[lang]
+            alignments = params["alignments"]
+            count_dict = params["count_dict"]
+            lang_pos = params["lang_pos"]
+            other_lang = params["other_lang"]
             if not lex:
+                lex = params["lex"]
+            del_conns = params["del_conns"]
+            other_lex = params["other_lex"]
+            complete_lex = params["complete_lex"]
+
+            new_alignments = defaultdict(list)
+            # Find all alignments for the current connective lexicon
+            # Connectives with inaccurate alignment are skipped
+            single_words = []
+            phrases = []
+            discontinuous = []
+            for conn in lex:
+                if conn in del_conns:
+                    continue
+                if "..." in conn:
+                    discontinuous.append(conn)
+                elif " " in conn:
+                    phrases.append(conn)
+                else:
+                    single_words.append(conn)
+
+            for key in single_words:
+                if key in alignments:
+                    new_alignments[key] = alignments[key]
+
+            # Phrases can only be aligned if all of their words occur
+            # as tokens in the corpus
+            tokens = self._get_corpus_tokens(lang_pos)
+            occurring_phrases = [phrase for phrase in phrases
+                                 if tokens.issuperset(phrase.split())]
+
+            new_phrase_alignments = self._parse_cached(
+                parse_phrase_alignments, self._phrase_cache[lang_pos],
+                occurring_phrases, lang_pos)
+
+            new_discontinuous = self._parse_cached(
+                parse_discontinuous, self._discont_cache[lang_pos],
+                discontinuous, lang_pos)
+
+            # Counts all connectives of the lexicon, including the ones
+            # without an alignment
+            single_count = conn_count(new_alignments,
+                                      single_words + phrases + discontinuous)
+            phrase_count = conn_count(new_phrase_alignments, phrases)
+            discont_count = conn_count(new_discontinuous, discontinuous)
+            count_dict.update(single_count)
+            count_dict.update(phrase_count)
+            count_dict.update(discont_count)
+
+            # Combine the single word and phrase alignments
+            new_alignments.update(new_phrase_alignments)
+            new_alignments.update(new_discontinuous)
+            new_alignments = remove_punct_values(new_alignments)
+            new_alignments = alignment_probabilities(new_alignments)
+            new_alignments = filter_most_common_conns(new_alignments,
+                                                      word_threshold,
+                                                      phrase_threshold)
+            new_alignments = remove_low_counts(new_alignments, count_dict,
+                                               word_min_count,
+                                               phrase_min_count)
+            new_alignments = filter_unlikely_alignments(new_alignments, lang)
+            new_alignments = remove_incomplete_phrases(new_alignments)
+            new_alignments = filter_single_words(new_alignments, lang)
+            new_alignments = remove_pronouns(new_alignments, other_lang)
+            new_alignments = complete_phrases(new_alignments, complete_lex)
+
+            # Find new connectives
+            new_conns = set().union(*new_alignments.values())
+            new_conns.difference_update(other_lex)
+            new_conns.discard("")
+            new_conns = list(new_conns)
+
+            if lang == "french":
+                self.fr_conn_alignments.update(new_alignments)
+                self.de_lex += new_conns
+                self._de_lex_set.update(new_conns)
                 lex = self.de_lex
-            # Delete connectives with inaccurate alignment
-            de_del = ["bloß", "dabei", "mangels", "mithin", "obschon",
-                      "wenn ... auch", "wiederum", "wobei", "wohingegen",
-                      "als ob"]
-            lex = [conn for conn in lex if conn not in de_del]
-            other_lex = self.fr_lex
-            complete_lex = self.all_fr_conns
-        else:
-            pass
-
-        new_conns = []
-        new_alignments = defaultdict(list)
-        # Find all alignments for the current connective lexicon
-        single_words = [word for word in lex if len(word.split()) == 1]
-        phrases = [phrase for phrase in lex if len(phrase.split()) > 1
-                   and "..." not in phrase]
-        discontinuous = [phrase for phrase in lex if "..." in phrase]
-
-        for key in single_words:
-            try:
-                new_alignments[key] = alignments[key]
-            except KeyError:
-                pass
-
-        new_phrase_alignments = parse_phrase_alignments(
-            self.alignment, self.german_corpus, self.french_corpus,
-            phrases, lang=lang_pos)
-
-        new_discontinuous = parse_discontinuous(
-            self.alignment, self.german_corpus, self.french_corpus,
-            discontinuous, lang=lang_pos)
-
-        single_count = conn_count(new_alignments, lex)
-        phrase_count = conn_count(new_phrase_alignments, phrases)
-        discont_count = conn_count(new_discontinuous, discontinuous)
-        if lang == "french":
-            self.fr_count.update(single_count)
-            self.fr_count.update(phrase_count)
-            self.fr_count.update(discont_count)
-        elif lang == "german":
-            self.de_count.update(single_count)
-            self.de_count.update(phrase_count)
-            self.de_count.update(discont_count)
-
-        # Combine the single word and phrase alignments
-        new_alignments = {**new_alignments, **new_phrase_alignments,
-                          **new_discontinuous}
-        new_alignments = remove_punct_values(new_alignments)
-        new_alignments = alignment_probabilities(new_alignments)
-        new_alignments = filter_most_common_conns(new_alignments,
-                                                  word_threshold,
-                                                  phrase_threshold)
-        new_alignments = remove_low_counts(new_alignments, count_dict,
-                                           word_min_count, phrase_min_count)
-        new_alignments = filter_unlikely_alignments(new_alignments, lang)
-        new_alignments = remove_incomplete_phrases(new_alignments)
-        new_alignments = filter_single_words(new_alignments, lang)
-        new_alignments = remove_pronouns(new_alignments, other_lang)
-        new_alignments = complete_phrases(new_alignments, complete_lex)
-
-        # Find new connectives
-        for conns in new_alignments.values():
-            for word, count in conns.items():
-                if word and word not in other_lex:
-                    new_conns.append(word)
-        new_conns = list(set(new_conns))
-
-        if lang == "french":
-            self.fr_conn_alignments.update(new_alignments)
-            self.de_lex += new_conns
-            lex = self.de_lex
-            lang = "german"
-        else:
-            self.de_conn_alignments.update(new_alignments)
-            self.fr_lex += new_conns
-            lex = self.fr_lex
-            lang = "french"
-
-        if self.counter == limit:
-            return
-
-        if self.counter == 1:
-            # Ensures that the first entries of the lexicon (DimLex or
-            # LexConn) are not ignored
-            self.find_conns(lex, lang, word_threshold, phrase_threshold,
-                            word_min_count, phrase_min_count, limit)
-        else:
-            self.find_conns(new_conns, lang, word_threshold, phrase_threshold,
-                            word_min_count, phrase_min_count, limit)
+                lang = "german"
+            else:
+                self.de_conn_alignments.update(new_alignments)
+                self.fr_lex += new_conns
+                self._fr_lex_set.update(new_conns)
+                lex = self.fr_lex
+                lang = "french"
+
+            if self.counter >= limit:
+                return
+
+            # After the first round, only the new connectives are
+            # searched; the first round keeps the complete lexicon so
+            # that its first entries (DimLex or LexConn) are not ignored
+            if self.counter > 1:
+                lex = new_conns
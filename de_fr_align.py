@@ -3,6 +3,7 @@
 """Organising the Output: Connectives Alignments and Visual Output"""
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from conn_search import FindAlignments
@@ -51,14 +52,31 @@ if __name__ == "__main__":
     else:
         language = "french"
 
-    german_word_alignment = json_to_dict("de_word_alignment.json")
-    french_word_alignment = json_to_dict("fr_word_alignment.json")
+    # The files are independent of each other and are loaded
+    # concurrently
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        de_word_future = executor.submit(json_to_dict,
+                                         "de_word_alignment.json")
+        fr_word_future = executor.submit(json_to_dict,
+                                         "fr_word_alignment.json")
+        lexconn_future = executor.submit(
+            read_fr_xml, Path("connectives_and_relations/lexconn_d.xml"))
+        dimlex_future = executor.submit(
+            read_de_xml, Path("connectives_and_relations/dimlex.xml"))
+        de_rel_future = executor.submit(
+            json_to_dict, Path("connectives_and_relations/de_relations.json"))
+        fr_rel_future = executor.submit(
+            json_to_dict, Path("connectives_and_relations/fr_relations.json"))
+        rel_future = executor.submit(
+            json_to_dict, Path("connectives_and_relations/relations.json"))
 
-    lexconn = read_fr_xml(Path("connectives_and_relations/lexconn_d.xml"))
-    dimlex = read_de_xml(Path("connectives_and_relations/dimlex.xml"))
-    de_rel = json_to_dict(Path("connectives_and_relations/de_relations.json"))
-    fr_rel = json_to_dict(Path("connectives_and_relations/fr_relations.json"))
-    rel = json_to_dict(Path("connectives_and_relations/relations.json"))
+    german_word_alignment = de_word_future.result()
+    french_word_alignment = fr_word_future.result()
+    lexconn = lexconn_future.result()
+    dimlex = dimlex_future.result()
+    de_rel = de_rel_future.result()
+    fr_rel = fr_rel_future.result()
+    rel = rel_future.result()
 
     if args.discourse_relation:
         fr_lex = filter_for_discourse_relation(lexconn, fr_rel,
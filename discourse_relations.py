@@ -2,10 +2,7 @@
 
 """Assigning Discourse Relations and Creating Visual Output"""
 
-from copy import deepcopy
-
-import pandas as pd
-import plotly.graph_objects as go
+from collections import defaultdict
 
 
 def add_discourse_relation(alignment, source_mapping, target_mapping):
@@ -32,23 +29,21 @@ def add_discourse_relation(alignment, source_mapping, target_mapping):
     Note: only useful as a visual representation
     """
 
-    rel_alignment = deepcopy(alignment)
-    # Adds the relation to the target words
+    rel_alignment = dict()
     for source, targets in alignment.items():
-        for target in targets.keys():
+        # Adds the relation to the target words
+        rel_targets = dict()
+        for target, probability in targets.items():
             if target in target_mapping:
                 relation = "(" + ", ".join(target_mapping[target]) + ")"
-                with_rel = target + " " + relation
-                probability = rel_alignment[source].pop(target)
-                rel_alignment[source][with_rel] = probability
-
-    # Adds the relation to the source words
-    for source, relation in source_mapping.items():
-        try:
-            relation = "(" + ", ".join(relation) + ")"
-            rel_alignment[source + " " + relation] = rel_alignment.pop(source)
-        except KeyError:
-            pass
+                target = target + " " + relation
+            rel_targets[target] = probability
+
+        # Adds the relation to the source words
+        if source in source_mapping:
+            relation = "(" + ", ".join(source_mapping[source]) + ")"
+            source = source + " " + relation
+        rel_alignment[source] = rel_targets
 
     return rel_alignment
 
@@ -77,17 +72,43 @@ def filter_for_discourse_relation(conn_lex, conn_rel, relation, rel_mapping):
     """
 
     filtered_conns = []
-    relations = rel_mapping[relation]
+    relations = set(rel_mapping[relation])
     for conn in conn_lex:
-        try:
-            if (set(conn_rel[conn]) & set(relations)):
-                filtered_conns.append(conn)
-        except KeyError:
-            pass
+        if conn in conn_rel and relations.intersection(conn_rel[conn]):
+            filtered_conns.append(conn)
 
     return filtered_conns
 
 
+def _normalize_relations(relations):
+    """Reduces relations to their second level, e.g.
+    "COMPARISON:Concession:Arg1-as-denier" -> "Concession"
+
+    Parameters
+    ----------
+    relations : list
+        The relations of a connective
+
+    Returns
+    -------
+    normalized : tuple
+        The sorted and unique relations
+    """
+
+    normalized = []
+    for rel in relations:
+        first_index = rel.find(":")
+        if first_index >= 0:
+            rel = rel[first_index+1:]
+        # Remove the information about arg1/arg2
+        second_index = rel.find(":")
+        if second_index >= 0:
+            rel = rel[:second_index]
+        normalized.append(rel.capitalize())
+
+    return tuple(sorted(set(normalized)))
+
+
 def discourse_relation_mapping(alignment, source_mapping, target_mapping):
     """Shows the discourse relations alignment
 
@@ -109,56 +130,34 @@ def discourse_relation_mapping(alignment, source_mapping, target_mapping):
         A dictionary showing which relations align with which relations
     """
 
-    rel_mapping = dict()
+    source_rels = {source: _normalize_relations(rels)
+                   for source, rels in source_mapping.items()}
+    target_rels = {target: _normalize_relations(rels)
+                   for target, rels in target_mapping.items()}
+
+    rel_mapping = defaultdict(lambda: [0, defaultdict(float)])
     # Adds the relation to the target words
     for source, targets in alignment.items():
-        if source in source_mapping:
-            source_rel = []
-            for rel in source_mapping[source]:
-                if ":" in rel:
-                    first_index = rel.find(":")
-                    rel = rel[first_index+1:]
-                # Remove the information about arg1/arg2
-                if ":" in rel:
-                    second_index = rel.find(":")
-                    rel = rel[:second_index]
-                source_rel.append(rel.capitalize())
-            source_rel = set(source_rel)
-            source_rel = str(sorted(source_rel))
-            if source_rel not in rel_mapping:
-                rel_mapping[source_rel] = [1, dict()]
-            else:
-                # Count how many connectives have this relation
-                rel_mapping[source_rel][0] += 1
-
-            for target in targets.keys():
-                if target in target_mapping:
-                    target_rel = []
-                    for rel in target_mapping[target]:
-                        if ":" in rel:
-                            first_index = rel.find(":")
-                            rel = rel[first_index+1:]
-                        # Remove the information about arg1/arg2
-                        if ":" in rel:
-                            second_index = rel.find(":")
-                            rel = rel[:second_index]
-                        target_rel.append(rel.capitalize())
-                    target_rel = set(target_rel)
-                    target_rel = str(sorted(target_rel))
-                    target_dict = rel_mapping[source_rel][1]
-                    if target_rel not in target_dict:
-                        target_dict[target_rel] = alignment[source][target]
-                    else:
-                        target_dict[target_rel] += alignment[source][target]
+        if source in source_rels:
+            source_rel = source_rels[source]
+            # Count how many connectives have this relation
+            entry = rel_mapping[source_rel]
+            entry[0] += 1
+            target_dict = entry[1]
+
+            for target, probability in targets.items():
+                target_rel = target_rels.get(target)
+                if target_rel is not None:
+                    target_dict[target_rel] += probability
 
     # Calculate the proportion of the relations aligned
-    for source, targets in rel_mapping.items():
-        total = sum(targets[1].values())
-        for target in targets[1].keys():
-            rel_dict = rel_mapping[source][1]
-            rel_dict[target] = rel_dict[target] / total
+    proportions = dict()
+    for source, (count, targets) in rel_mapping.items():
+        total = sum(targets.values())
+        proportions[source] = [count, {target: value / total
+                                       for target, value in targets.items()}]
 
-    return rel_mapping
+    return proportions
 
 
 def create_sankey_diagram(alignments, lang1, lang2, rel, file_name):
@@ -181,32 +180,29 @@ def create_sankey_diagram(alignments, lang1, lang2, rel, file_name):
     Creates the sankey diagram as a png file
     """
 
-    rel_labels = []
+    # Plotly is only imported when a diagram is actually created
+    import plotly.graph_objects as go
+
+    label_to_idx = dict()
     source_indices = []
     target_indices = []
     values = []
 
-    # Add labels for the sankey diagram
-    for source, targets in alignments.items():
-        rel_labels.append(f"{lang1}: {source}")
-        for target in targets[1].keys():
-            rel_labels.append(f"{lang2}: {target}")
-    rel_labels = pd.unique(rel_labels).tolist()
-
-    # Adds the index of source and target
+    # Adds the labels for the sankey diagram and the index of source
+    # and target in the order the labels first occur
     for source, targets in alignments.items():
-        source_index = rel_labels.index(f"{lang1}: {source}")
-        for target in targets[1].keys():
-            target_index = rel_labels.index(f"{lang2}: {target}")
+        source_label = f"{lang1}: {', '.join(source)}"
+        source_index = label_to_idx.setdefault(source_label,
+                                               len(label_to_idx))
+        count = targets[0]
+        for target, proportion in targets[1].items():
+            target_label = f"{lang2}: {', '.join(target)}"
+            target_index = label_to_idx.setdefault(target_label,
+                                                   len(label_to_idx))
             source_indices.append(source_index)
             target_indices.append(target_index)
-            values.append(alignments[source][1][target]
-                          * alignments[source][0])
-
-    for index in range(len(rel_labels)):
-        rel_labels[index] = rel_labels[index].replace("'", "")
-        rel_labels[index] = rel_labels[index].replace("[", "")
-        rel_labels[index] = rel_labels[index].replace("]", "")
+            values.append(proportion * count)
+    rel_labels = list(label_to_idx)
 
     colours = ["rgba(77, 130, 219, 0.5)",
                "rgba(155, 222, 130, 0.5)",
@@ -239,12 +235,14 @@ def create_sankey_diagram(alignments, lang1, lang2, rel, file_name):
                "rgba(135, 214, 181, 0.5)",
                "rgba(206, 145, 145, 0.6)"]
 
+    # Each source relation gets its own colour, the colours are reused
+    # if there are more source relations than colours
     colour_mapping = dict()
-    for index, rel_id in enumerate(pd.unique(source_indices).tolist()):
-        colour_mapping[rel_id] = colours[index]
-
     colour = []
     for source_id in source_indices:
+        if source_id not in colour_mapping:
+            colour_mapping[source_id] = colours[len(colour_mapping)
+                                                % len(colours)]
         colour.append(colour_mapping[source_id])
 
     fig = go.Figure(data=[go.Sankey(
@@ -3,15 +3,174 @@
 """Parse Word Alignments"""
 
 import argparse
+import os
+import sys
 from collections import defaultdict
-
-import pandas as pd
+from functools import lru_cache
+from multiprocessing import Pool
 
 from processing_filtering import (remove_contractions, save_alignments,
                                   remove_punct_phrases)
 
+# The corpus and alignment files are read in large chunks
+BUFFER_SIZE = 1024 * 1024
+# Number of sentences parsed at once by a process
+CHUNK_SIZE = 10000
+
+# Phrases ending with these contractions are adjusted
+_FR_CONTRACTIONS = frozenset(["d'", "du", "des", "aux", "au"])
+_DE_CONTRACTIONS = frozenset(["zur", "zum", "vom"])
+_ALL_CONTRACTIONS = _FR_CONTRACTIONS | _DE_CONTRACTIONS
+
+
+@lru_cache(maxsize=65536)
+def _cached_remove_punct_phrases(tokens):
+    """remove_punct_phrases for a tuple of tokens, the same phrases
+    recur in many sentences"""
+
+    return tuple(remove_punct_phrases(list(tokens)))
+
+
+@lru_cache(maxsize=65536)
+def _cached_remove_contractions(phrase, lang):
+    """remove_contractions for a tuple of tokens"""
+
+    return remove_contractions(list(phrase), lang)
+
+
+def _parse_sentence_pairs(lines):
+    """Creates the alignments for single words, phrases and
+    discontinous phrases of some sentences
+
+    Parameters
+    ----------
+    lines : iterable
+        Tuples with a line of the word alignment, the German sentence
+        and the French sentence
+
+    Returns
+    -------
+    de_fr_alignments: defaultdict
+        A dictionary with German keys and the French alignments as
+        values
+    fr_de_alignments: defaultdict
+        A dictionary with French keys and the German alignments as
+        values
+    """
+
+    de_fr_alignments = defaultdict(list)
+    fr_de_alignments = defaultdict(list)
+
+    for index, de, fr in lines:
+        # The same words and alignments occur many times in the corpus,
+        # interned strings are stored only once and compared faster
+        german = list(map(sys.intern, de.split()))
+        french = list(map(sys.intern, fr.split()))
+        # "0-1 2-3" -> [(0, 1), (2, 3)]
+        alignment = list(map(int, index.replace("-", " ").split()))
+        pair = list(zip(alignment[::2], alignment[1::2]))
+
+        # Adds an empty string as alignment if there is no
+        # alignment for a word
+        de_aligned = {word1 for word1, word2 in pair}
+        fr_aligned = {word2 for word1, word2 in pair}
+        for m in range(len(german)):
+            if m not in de_aligned:
+                de_fr_alignments[german[m]].append("")
+        for m in range(len(french)):
+            if m not in fr_aligned:
+                fr_de_alignments[french[m]].append("")
+
+        # Adds the alignments to dictionaries so that phrases
+        # are allowed as well
+        phrase_align_fr_r = defaultdict(list)
+        phrase_align_de_r = defaultdict(list)
+        for word1, word2 in pair:
+            phrase_align_fr_r[word2].append(word1)
+            phrase_align_de_r[word1].append(word2)
+
+        # The dictionary is reversed so that phrases are possible
+        # for both directions
+        phrase_align_de = defaultdict(list)
+        phrase_align_fr = defaultdict(list)
+        for k, v in phrase_align_fr_r.items():
+            phrase_align_de[tuple(v)].append(k)
+        for k, v in phrase_align_de_r.items():
+            phrase_align_fr[tuple(v)].append(k)
+
+        # For German - French
+        for de, fr in phrase_align_de.items():
+            # Identifies discontinous phrases
+            # However, seems more like alignment errors
+            if len(fr) > 1:
+                for pos in range(len(fr)-1):
+                    if isinstance(fr[pos], int)\
+                            and isinstance(fr[pos+1], int):
+                        if abs(fr[pos] - fr[pos+1]) > 1:
+                            fr.insert(pos+1, "...")
+
+            # Index is replaced by the corresponding word
+            k = tuple(german[i] if isinstance(i, int) else i for i in de)
+            v = tuple(french[i] if isinstance(i, int) else i for i in fr)
+            k = _cached_remove_punct_phrases(k)
+            v = _cached_remove_punct_phrases(v)
+            if v and v[-1] in _FR_CONTRACTIONS:
+                v = _cached_remove_contractions(v, "french")
+            de_fr_alignments[sys.intern(" ".join(k))].append(
+                sys.intern(" ".join(v)))
+
+        # For French - German
+        for fr, de in phrase_align_fr.items():
+            # Identifies discontinous phrases
+            if len(de) > 1:
+                for pos in range(len(de)-1):
+                    if isinstance(de[pos], int)\
+                            and isinstance(de[pos+1], int):
+                        if abs(de[pos] - de[pos+1]) == 2:
+                            if german[de[pos]+1] == ",":
+                                de.insert(pos+1, ",")
+                            else:
+                                de.insert(pos+1, "...")
+                        elif abs(de[pos] - de[pos+1]) > 2:
+                            de.insert(pos+1, "...")
 
-def parse_alignments(result, german_sentences, french_sentences):
+            # Index is replaced by the corresponding word
+            k = tuple(french[i] if isinstance(i, int) else i for i in fr)
+            v = tuple(german[i] if isinstance(i, int) else i for i in de)
+            k = _cached_remove_punct_phrases(k)
+            v = _cached_remove_punct_phrases(v)
+            if v and v[-1] in _DE_CONTRACTIONS:
+                v = _cached_remove_contractions(v, "german")
+            fr_de_alignments[sys.intern(" ".join(k))].append(
+                sys.intern(" ".join(v)))
+
+    return de_fr_alignments, fr_de_alignments
+
+
+def _chunks(lines, size):
+    """Splits an iterable into lists with at most size elements"""
+
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _merge_alignments(merged, alignments):
+    """Appends the alignments of a chunk of sentences to merged"""
+
+    # Strings are not interned anymore after being sent between
+    # processes
+    for source, targets in alignments.items():
+        merged[sys.intern(source)].extend(map(sys.intern, targets))
+
+
+def parse_alignments(result, german_sentences, french_sentences,
+                     processes=1):
     """Creates alignments for single words, phrases and discontinous
     phrases based on the word alignment
 
@@ -23,6 +182,8 @@ def parse_alignments(result, german_sentences, french_sentences):
         The file name for the German corpus
     french_sentences : str
         The file name for the French corpus
+    processes : int
+        The number of processes used to parse the sentences
 
     Returns
     -------
@@ -34,99 +195,25 @@ def parse_alignments(result, german_sentences, french_sentences):
         values
     """
 
-    de_fr_alignments = defaultdict(list)
-    fr_de_alignments = defaultdict(list)
-
-    with open(result, "r", encoding="utf-8") as result,\
-            open(german_sentences, "r", encoding="utf-8") as german,\
-            open(french_sentences, "r", encoding="utf-8") as french:
-        for index, de, fr in zip(result, german, french):
-            german = de.split()
-            french = fr.split()
-            alignment = index.split()
-            pair = [[a.split("-")[0], a.split("-")[1]] for a in alignment]
-
-            # Adds an empty string as alignment if there is no
-            # alignment for a word
-            de_missing = list(range(0, len(german)))
-            fr_missing = list(range(0, len(french)))
-            for word1, word2 in pair:
-                try:
-                    de_missing.remove(int(word1))
-                except ValueError:
-                    pass
-                try:
-                    fr_missing.remove(int(word2))
-                except ValueError:
-                    pass
-
-            if de_missing:
-                for m in de_missing:
-                    de_fr_alignments[german[m]].append("")
-            if fr_missing:
-                for m in fr_missing:
-                    fr_de_alignments[french[m]].append("")
-
-            # Adds the alignments to dictionaries so that phrases
-            # are allowed as well
-            phrase_align_fr_r = defaultdict(list)
-            phrase_align_de_r = defaultdict(list)
-            for p in pair:
-                phrase_align_fr_r[p[1]].append(p[0])
-                phrase_align_de_r[p[0]].append(p[1])
-
-            # The dictionary is reversed so that phrases are possible
-            # for both directions
-            phrase_align_de = defaultdict(list)
-            phrase_align_fr = defaultdict(list)
-            for k, v in phrase_align_fr_r.items():
-                phrase_align_de[tuple(v)].append(k)
-            for k, v in phrase_align_de_r.items():
-                phrase_align_fr[tuple(v)].append(k)
-
-            # Identifies discontinous phrases
-            # However, seems more like alignment errors
-            # For German - French
-            for k, v in phrase_align_de.items():
-                if len(v) > 1:
-                    for pos in range(len(v)-1):
-                        if v[pos].isnumeric() and v[pos+1].isnumeric():
-                            if abs(int(v[pos]) - int(v[pos+1])) > 1:
-                                phrase_align_de[k].insert(pos+1, "...")
-
-            # For French - German
-            for k, v in phrase_align_fr.items():
-                if len(v) > 1:
-                    for pos in range(len(v)-1):
-                        if v[pos].isnumeric() and v[pos+1].isnumeric():
-                            if abs(int(v[pos]) - int(v[pos+1])) == 2:
-                                if german[int(v[pos])+1] == ",":
-                                    phrase_align_fr[k].insert(pos+1, ",")
-                                else:
-                                    phrase_align_fr[k].insert(pos+1, "...")
-                            elif abs(int(v[pos]) - int(v[pos+1])) > 2:
-                                phrase_align_fr[k].insert(pos+1, "...")
-
-            # Index is replaced by the corresponding word
-            for de, fr in phrase_align_de.items():
-                k = ([german[int(i)] if i.isnumeric() else i for i in de])
-                v = ([french[int(i)] if i.isnumeric() else i for i in fr])
-                k = remove_punct_phrases(k)
-                v = remove_punct_phrases(v)
-                contractions = ["d'", "du", "des", "aux", "au"]
-                if v and v[-1] in contractions:
-                    v = remove_contractions(v, "french")
-                de_fr_alignments[" ".join(k)].append(" ".join(v))
-
-            for fr, de in phrase_align_fr.items():
-                k = ([french[int(i)] if i.isnumeric() else i for i in fr])
-                v = ([german[int(i)] if i.isnumeric() else i for i in de])
-                k = remove_punct_phrases(k)
-                v = remove_punct_phrases(v)
-                contractions = ["zur", "zum", "vom"]
-                if v and v[-1] in contractions:
-                    v = remove_contractions(v, "german")
-                fr_de_alignments[" ".join(k)].append(" ".join(v))
+    with open(result, "r", encoding="utf-8",
+              buffering=BUFFER_SIZE) as result,\
+            open(german_sentences, "r", encoding="utf-8",
+                 buffering=BUFFER_SIZE) as german,\
+            open(french_sentences, "r", encoding="utf-8",
+                 buffering=BUFFER_SIZE) as french:
+        lines = zip(result, german, french)
+        if processes == 1:
+            return _parse_sentence_pairs(lines)
+
+        # The sentences are parsed in chunks by several processes,
+        # the chunks are merged in the order of the corpus
+        de_fr_alignments = defaultdict(list)
+        fr_de_alignments = defaultdict(list)
+        with Pool(processes) as pool:
+            for de_fr, fr_de in pool.imap(_parse_sentence_pairs,
+                                          _chunks(lines, CHUNK_SIZE)):
+                _merge_alignments(de_fr_alignments, de_fr)
+                _merge_alignments(fr_de_alignments, fr_de)
 
     return de_fr_alignments, fr_de_alignments
 
@@ -160,96 +247,89 @@ def parse_phrase_alignments(result, language1, language2, phrases, lang=1):
         A dictionary with the alignments for phrases
     """
 
-    de_fr_count = defaultdict(int)
-    fr_de_count = defaultdict(int)
+    # Phrases are grouped by their first word so that each sentence
+    # is only searched once for all phrases
+    first_words = defaultdict(list)
+    for phrase_ in phrases:
+        phrase = phrase_.split()
+        if phrase:
+            first_words[phrase[0]].append((phrase_, phrase))
 
     phrase_alignments = defaultdict(list)
-    with open(result, "r", encoding="utf-8") as result,\
-            open(language1, "r", encoding="utf-8") as lang1,\
-            open(language2, "r", encoding="utf-8") as lang2:
-        for index, l1, l2 in zip(result, lang1, lang2):
-            lang_1 = l1.split()
-            lang_2 = l2.split()
-            alignment = index.split()
-            pair = [[int(a.split("-")[0]), int(a.split("-")[1])]
-                    for a in alignment]
-            if lang == 1:
-                sentence = l1
-                source_tok = lang_1
-                target_tok = lang_2
-            elif lang == 2:
-                sentence = l2
-                source_tok = lang_2
-                target_tok = lang_1
-
-            for phrase_ in phrases:
-                if phrase_ in sentence:
-                    phrase = phrase_.split()
-                    # Index of the phrase words in the source language
-                    phrase_index = []
-                    # Searches the exact position of the phrase in the
-                    # string
-                    # Might occur more than once, although unlikely
-                    for pos in range(0, len(source_tok) - len(phrase) + 1):
-                        if source_tok[pos:pos+len(phrase)] == phrase:
-                            phrase_index.append(list(range(pos,
-                                                           pos + len(phrase))))
-
-                    for pos_range in phrase_index:
-                        # Indexes of the target words
-                        new_phrase = []
-                        for word_pos in pos_range:
-                            # Saves all target indexes in a list
-                            if lang == 1:
-                                alignment_index = [i2 for i1, i2 in pair
-                                                   if i1 == word_pos]
-                            elif lang == 2:
-                                alignment_index = [i1 for i1, i2 in pair
-                                                   if i2 == word_pos]
-                            new_phrase += alignment_index
-                        new_phrase = pd.unique(new_phrase).tolist()
-                        if len(new_phrase) > 1:
-                            new_phrase.sort()
-                            # Inserts "..." for discontinuous
-                            # phrases
-                            pos = 0
-                            while pos < len(new_phrase) - 1:
-                                if isinstance(new_phrase[pos], int)\
-                                        and isinstance(new_phrase[pos+1], int):
-                                    if abs(new_phrase[pos]
-                                           - new_phrase[pos+1]) == 2:
-                                        if target_tok[new_phrase[pos]+1]\
-                                                == ",":
-                                            new_phrase.insert(pos+1, ",")
-                                        else:
-                                            new_phrase.insert(pos+1, "...")
-                                    elif abs(new_phrase[pos]
-                                             - new_phrase[pos+1]) > 2:
-                                        new_phrase.insert(pos+1, "...")
-                                pos += 1
-                        # Index is replaced by the corresponding word
-                        new_phrase = [target_tok[pos] if isinstance(pos, int)
-                                      else pos
-                                      for pos in new_phrase]
-                        new_phrase = remove_punct_phrases(new_phrase)
-                        contractions = ["d'", "du", "des", "aux", "au", "zur",
-                                        "zum", "vom"]
-                        if new_phrase and new_phrase[-1] in contractions:
-                            if lang == 1:
-                                new_phrase = remove_contractions(new_phrase,
-                                                                 "french")
+    with open(result, "r", encoding="utf-8",
+              buffering=BUFFER_SIZE) as result,\
+            open(language1, "r", encoding="utf-8",
+                 buffering=BUFFER_SIZE) as lang1,\
+            open(language2, "r", encoding="utf-8",
+                 buffering=BUFFER_SIZE) as lang2:
+        # The phrases belong to the first or the second language
+        if lang == 1:
+            source_lines, target_lines = lang1, lang2
+            source_start, target_lang = 0, "french"
+        else:
+            source_lines, target_lines = lang2, lang1
+            source_start, target_lang = 1, "german"
+
+        for index, sentence, target_sentence in zip(result, source_lines,
+                                                    target_lines):
+            source_tok = sentence.split()
+            target_tok = target_sentence.split()
+            # "0-1 2-3" -> [0, 1, 2, 3]
+            alignment = list(map(int, index.replace("-", " ").split()))
+
+            # Saves all target indexes of a source index
+            target_indexes = defaultdict(list)
+            for source_index, target_index in zip(
+                    alignment[source_start::2],
+                    alignment[1 - source_start::2]):
+                target_indexes[source_index].append(target_index)
+
+            # Searches the exact positions of the phrases in the
+            # sentence, a phrase might occur more than once
+            phrase_index = []
+            for pos, token in enumerate(source_tok):
+                for phrase_, phrase in first_words.get(token, []):
+                    if source_tok[pos:pos+len(phrase)] == phrase\
+                            and phrase_ in sentence:
+                        # Index of the phrase words in the source
+                        # language
+                        phrase_index.append((phrase_,
+                                             range(pos, pos + len(phrase))))
+
+            for phrase_, pos_range in phrase_index:
+                # Indexes of the target words
+                new_phrase = []
+                for word_pos in pos_range:
+                    new_phrase += target_indexes.get(word_pos, [])
+                new_phrase = list(dict.fromkeys(new_phrase))
+                if len(new_phrase) > 1:
+                    new_phrase.sort()
+                    # Inserts "..." for discontinuous phrases
+                    with_gaps = [new_phrase[0]]
+                    for prev, cur in zip(new_phrase, new_phrase[1:]):
+                        if cur - prev == 2:
+                            if target_tok[prev+1] == ",":
+                                with_gaps.append(",")
                             else:
-                                new_phrase = remove_contractions(new_phrase,
-                                                                 "german")
-                        else:
-                            new_phrase = " ".join(new_phrase)
-                        if ", ..." in new_phrase:
-                            new_phrase = new_phrase.replace(", ...", "...")
-                        phrase_alignments[phrase_].append(new_phrase)
-                        if lang == 1:
-                            de_fr_count[phrase_] += 1
-                        else:
-                            fr_de_count[phrase_] += 1
+                                with_gaps.append("...")
+                        elif cur - prev > 2:
+                            with_gaps.append("...")
+                        with_gaps.append(cur)
+                    new_phrase = with_gaps
+                # Index is replaced by the corresponding word
+                new_phrase = tuple(target_tok[pos] if isinstance(pos, int)
+                                   else pos
+                                   for pos in new_phrase)
+                new_phrase = _cached_remove_punct_phrases(new_phrase)
+                if new_phrase and new_phrase[-1] in _ALL_CONTRACTIONS:
+                    new_phrase = _cached_remove_contractions(new_phrase,
+                                                             target_lang)
+                else:
+                    new_phrase = " ".join(new_phrase)
+                # The builder never puts "," directly before "...", but an
+                # aligned word ending with a comma can be followed by "..."
+                new_phrase = new_phrase.replace(", ...", "...")
+                phrase_alignments[phrase_].append(new_phrase)
 
     return phrase_alignments
 
@@ -283,30 +363,43 @@ def parse_discontinuous(result, language1, language2, phrases, lang=1):
         A dictionary with the alignments for phrases
     """
 
-    de_fr_count = defaultdict(int)
-    fr_de_count = defaultdict(int)
+    # The phrases are split into their parts and tokens only once
+    split_phrases = []
+    for phrase_ in phrases:
+        phrase = phrase_.split(" ... ")
+        split_phrases.append((phrase_, phrase,
+                              [part.split() for part in phrase]))
 
     phrase_alignments = defaultdict(list)
-    with open(result, "r", encoding="utf-8") as result,\
-            open(language1, "r", encoding="utf-8") as lang1,\
-            open(language2, "r", encoding="utf-8") as lang2:
-        for index, l1, l2 in zip(result, lang1, lang2):
-            lang_1 = l1.split()
-            lang_2 = l2.split()
-            alignment = index.split()
-            pair = [[int(a.split("-")[0]), int(a.split("-")[1])]
-                    for a in alignment]
-            if lang == 1:
-                sentence = l1
-                source_tok = lang_1
-                target_tok = lang_2
-            elif lang == 2:
-                sentence = l2
-                source_tok = lang_2
-                target_tok = lang_1
-
-            for phrase_ in phrases:
-                phrase = phrase_.split(" ... ")
+    with open(result, "r", encoding="utf-8",
+              buffering=BUFFER_SIZE) as result,\
+            open(language1, "r", encoding="utf-8",
+                 buffering=BUFFER_SIZE) as lang1,\
+            open(language2, "r", encoding="utf-8",
+                 buffering=BUFFER_SIZE) as lang2:
+        # The phrases belong to the first or the second language
+        if lang == 1:
+            source_lines, target_lines = lang1, lang2
+            source_start, target_lang = 0, "french"
+        else:
+            source_lines, target_lines = lang2, lang1
+            source_start, target_lang = 1, "german"
+
+        for index, sentence, target_sentence in zip(result, source_lines,
+                                                    target_lines):
+            source_tok = sentence.split()
+            target_tok = target_sentence.split()
+            # "0-1 2-3" -> [0, 1, 2, 3]
+            alignment = list(map(int, index.replace("-", " ").split()))
+
+            # Saves all target indexes of a source index
+            target_indexes = defaultdict(list)
+            for source_index, target_index in zip(
+                    alignment[source_start::2],
+                    alignment[1 - source_start::2]):
+                target_indexes[source_index].append(target_index)
+
+            for phrase_, phrase, part_tokens in split_phrases:
                 if phrase[0] in sentence\
                         and phrase[1] in sentence\
                         and sentence.index(phrase[0])\
@@ -316,8 +409,7 @@ def parse_discontinuous(result, language1, language2, phrases, lang=1):
                     # Searches the exact position of the phrase in the
                     # string
                     # Might occur more than once, although unlikely
-                    for part in phrase:
-                        part = part.split()
+                    for part in part_tokens:
                         for pos in range(0, len(source_tok) - len(part) + 1):
                             if source_tok[pos:pos+len(part)] == part:
                                 source_pos = list(range(pos, pos
@@ -330,57 +422,37 @@ def parse_discontinuous(result, language1, language2, phrases, lang=1):
                     for pos_range in phrase_index:
                         # Indexes of the target words
                         for word_pos in pos_range:
-                            # Saves all target indexes in a list
-                            if lang == 1:
-                                alignment_index = [i2 for i1, i2 in pair
-                                                   if i1 == word_pos]
-                            elif lang == 2:
-                                alignment_index = [i1 for i1, i2 in pair
-                                                   if i2 == word_pos]
-                            new_phrase += alignment_index
-
-                    new_phrase = pd.unique(new_phrase).tolist()
+                            new_phrase += target_indexes.get(word_pos, [])
+
+                    new_phrase = list(dict.fromkeys(new_phrase))
                     if len(new_phrase) > 1:
                         new_phrase.sort()
                         # Inserts "..." for discontinuous phrases
-                        pos = 0
-                        while pos < len(new_phrase) - 1:
-                            if isinstance(new_phrase[pos], int)\
-                                    and isinstance(new_phrase[pos+1], int):
-                                if abs(new_phrase[pos]
-                                       - new_phrase[pos+1]) == 2:
-                                    if target_tok[new_phrase[pos]+1]\
-                                            == ",":
-                                        new_phrase.insert(pos+1, ",")
-                                    else:
-                                        new_phrase.insert(pos+1, "...")
-                                elif abs(new_phrase[pos]
-                                         - new_phrase[pos+1]) > 1:
-                                    new_phrase.insert(pos+1, "...")
-                            pos += 1
+                        with_gaps = [new_phrase[0]]
+                        for prev, cur in zip(new_phrase, new_phrase[1:]):
+                            if cur - prev == 2:
+                                if target_tok[prev+1] == ",":
+                                    with_gaps.append(",")
+                                else:
+                                    with_gaps.append("...")
+                            elif cur - prev > 2:
+                                with_gaps.append("...")
+                            with_gaps.append(cur)
+                        new_phrase = with_gaps
                     # Index is replaced by the corresponding word
-                    new_phrase = [target_tok[pos] if isinstance(pos, int)
-                                  else pos
-                                  for pos in new_phrase]
-                    new_phrase = remove_punct_phrases(new_phrase)
-                    contractions = ["d'", "du", "des", "aux", "au", "zur",
-                                    "zum", "vom"]
-                    if new_phrase and new_phrase[-1] in contractions:
-                        if lang == 1:
-                            new_phrase = remove_contractions(new_phrase,
-                                                             "french")
-                        else:
-                            new_phrase = remove_contractions(new_phrase,
-                                                             "german")
+                    new_phrase = tuple(target_tok[pos] if isinstance(pos, int)
+                                       else pos
+                                       for pos in new_phrase)
+                    new_phrase = _cached_remove_punct_phrases(new_phrase)
+                    if new_phrase and new_phrase[-1] in _ALL_CONTRACTIONS:
+                        new_phrase = _cached_remove_contractions(new_phrase,
+                                                                 target_lang)
                     else:
                         new_phrase = " ".join(new_phrase)
-                    if ", ..." in new_phrase:
-                        new_phrase = new_phrase.replace(", ...", "...")
+                    # The builder never puts "," directly before "...", but an
+                    # aligned word ending with a comma can be followed by "..."
+                    new_phrase = new_phrase.replace(", ...", "...")
                     phrase_alignments[phrase_].append(new_phrase)
-                    if lang == 1:
-                        de_fr_count[phrase_] += 1
-                    else:
-                        fr_de_count[phrase_] += 1
 
     return phrase_alignments
 
@@ -391,8 +463,13 @@ if __name__ == "__main__":
                         help="Alignment text file in Pharaoh format")
     parser.add_argument("german_corpus", help="Corpus with German sentences")
     parser.add_argument("french_corpus", help="Corpus with French sentences")
+    parser.add_argument("-p", "--processes", action="store",
+                        default=os.cpu_count() or 1, type=int,
+                        help="Number of processes used for parsing")
     args = parser.parse_args()
+    if args.processes < 1:
+        parser.error("argument -p/--processes: must be at least 1")
     german, french = parse_alignments(args.word_alignment, args.german_corpus,
-                                      args.french_corpus)
+                                      args.french_corpus, args.processes)
     save_alignments("de_word_alignment.json", german)
     save_alignments("fr_word_alignment.json", french)
@@ -3,13 +3,48 @@
 """Filtering and Processing Data"""
 
 import json
-import pandas as pd
+import re
 import string
 import xml.etree.ElementTree as ET
 from collections import Counter, defaultdict
-from copy import deepcopy
-
-from nltk.tokenize import word_tokenize, RegexpTokenizer
+from functools import lru_cache
+
+from nltk.tokenize import word_tokenize
+
+try:
+    # Faster reading of the JSON files if available
+    import orjson
+except ImportError:
+    orjson = None
+
+# Same result as the substring test "token in string.punctuation", which
+# also matches runs of punctuation such as "()"
+_PUNCT = frozenset(string.punctuation[start:end]
+                   for start in range(len(string.punctuation))
+                   for end in range(start + 1, len(string.punctuation) + 1))
+
+# Tokenization of the French connectives: "d'abord" -> "d' abord"
+_FR_TOKEN_RE = re.compile(r"\w*qu'|\w'|\w+(?:['-]\w+)*|[.,!?;]")
+
+# Alignments ending with these words are removed, keyed by the language of
+# the sources
+_UNLIKELY_WORDS = {
+    "french": frozenset(["ich", "du", "er", "sie", "es", "wir", "ihr",
+                         "das", "des", "die", "der", "einer", "eines",
+                         "eine", "ist", "dem", "sich", "unseres", "ein"]),
+    "german": frozenset(["l'", "ce"])}
+# Single words that are never connectives, keyed by the language of the
+# sources
+_SINGLE_DEL_WORDS = {
+    "french": frozenset(["dass", "wenn", "auf", "vor", "in", "mit"]),
+    "german": frozenset(["avec", "dans", "devant", "par", "bien", "de",
+                         "quoi", "même", "tout", "que", "qu'", "en", "est",
+                         "ce", "sous", "qui", "s'", "si", "lors", "pendant",
+                         "durant"])}
+_PRONOUNS = {
+    "german": frozenset(["ich", "du", "er", "sie", "es", "wir", "ihr"]),
+    "french": frozenset(["j'", "je", "tu", "il", "elle", "on", "nous",
+                         "vous", "ils", "elles"])}
 
 
 def filter_most_common_conns(dictionary, word_threshold, phrase_threshold):
@@ -28,15 +63,12 @@ def filter_most_common_conns(dictionary, word_threshold, phrase_threshold):
         The alignment without the values less than the threshold
     """
 
-    filtered = deepcopy(dictionary)
-    for source, target in dictionary.items():
-        for conn, count in target.items():
-            if len(conn.split()) == 1:
-                if count < word_threshold:
-                    del filtered[source][conn]
-            if len(conn.split()) > 1:
-                if count < phrase_threshold:
-                    del filtered[source][conn]
+    # Empty alignments are neither words nor phrases and are kept
+    filtered = {source: {conn: count for conn, count in target.items()
+                         if not conn
+                         or count >= (phrase_threshold if " " in conn
+                                      else word_threshold)}
+                for source, target in dictionary.items()}
 
     return filtered
 
@@ -57,16 +89,10 @@ def alignment_probabilities(alignments):
 
     conn_alignments = dict()
     for key in alignments:
-        try:
-            conn_alignments[key] = Counter(alignments[key])
-        except KeyError:
-            continue
-
-    for k, v in conn_alignments.items():
-        exp = dict()
-        for word, count in v.items():
-            exp[word] = count / sum(v.values())
-        conn_alignments[k] = exp
+        counts = Counter(alignments[key])
+        total = sum(counts.values())
+        conn_alignments[key] = {word: count / total
+                                for word, count in counts.items()}
 
     return conn_alignments
 
@@ -117,16 +143,14 @@ def remove_low_counts(prob_dict, count_dict, word_count, phrase_count):
         The probability alignment without the low numbers
     """
 
-    filtered_prob_dict = deepcopy(prob_dict)
-
+    filtered_prob_dict = dict()
     for source, alignment in prob_dict.items():
-        for target in alignment.keys():
-            if len(target.split()) == 1:
-                if count_dict[source][target] < word_count:
-                    filtered_prob_dict[source].pop(target)
-            else:
-                if count_dict[source][target] < phrase_count:
-                    filtered_prob_dict[source].pop(target)
+        counts = count_dict[source]
+        # Empty alignments are compared with the phrase count
+        filtered_prob_dict[source] = {
+            target: probability for target, probability in alignment.items()
+            if counts[target] >= (word_count if target and " " not in target
+                                  else phrase_count)}
 
     return filtered_prob_dict
 
@@ -147,49 +171,81 @@ def filter_unlikely_alignments(alignments, lang):
         The filtered probability alignment
     """
 
-    if lang == "french":
-        del_words = ["ich", "du", "er", "sie", "es", "wir", "ihr", "sie",
-                     "das", "des", "die", "der", "einer", "eines", "eine",
-                     "ist", "dem", "sich", "unseres", "ein"]
-    elif lang == "german":
-        del_words = ["l'", "ce"]
+    del_words = _UNLIKELY_WORDS[lang]
 
     for source in alignments.keys():
+        # Only the phrases are split, each of them once
         singles = [single for single in alignments[source]
-                   if len(single.split()) == 1]
-        phrases = [phrase for phrase in alignments[source]
-                   if len(phrase.split()) > 1]
-        filtered_phrases = deepcopy(phrases)
+                   if single and " " not in single]
+        phrases = [phrase for phrase in alignments[source] if " " in phrase]
+        tokens = {phrase: phrase.split() for phrase in phrases}
+        filtered_phrases = []
         for phrase in phrases:
-            if phrase.split()[-1] in del_words:
+            if tokens[phrase][-1] in del_words:
                 del alignments[source][phrase]
-                filtered_phrases.remove(phrase)
+            else:
+                filtered_phrases.append(phrase)
 
         for single in singles:
             if single in del_words and single in alignments[source]:
                 del alignments[source][single]
             for phrase in filtered_phrases:
-                if single in phrase.split() and single in alignments[source]\
+                if single in tokens[phrase] and single in alignments[source]\
                         and alignments[source][single] < 0.18:
                     del alignments[source][single]
 
-        filtered_phr = deepcopy(filtered_phrases)
-        for in_phrase in filtered_phr:
-            for out_phrase in filtered_phr:
-                if in_phrase != out_phrase\
-                        and out_phrase in filtered_phrases\
-                        and in_phrase in out_phrase\
-                        and len(in_phrase.split()) != len(out_phrase.split())\
-                        and in_phrase in alignments[source]\
-                        and alignments[source][in_phrase] < 0.18\
+        # A phrase can only be contained in a phrase with more tokens, so
+        # each phrase is only compared with the longer ones
+        token_tuples = {phrase: tuple(tokens[phrase])
+                        for phrase in filtered_phrases}
+        by_len = defaultdict(list)
+        for phrase in filtered_phrases:
+            by_len[len(tokens[phrase])].append(phrase)
+        deleted = set()
+        for in_phrase in filtered_phrases:
+            # Likely phrases are kept without searching the longer ones
+            if alignments[source][in_phrase] >= 0.18:
+                continue
+            in_len = len(tokens[in_phrase])
+            longer = [out_phrase for length in by_len if length > in_len
+                      for out_phrase in by_len[length]]
+            for out_phrase in longer:
+                if out_phrase not in deleted\
+                        and _contains_tokens(token_tuples[in_phrase],
+                                             token_tuples[out_phrase])\
                         and alignments[source][in_phrase]\
                         / alignments[source][out_phrase] < 3:
                     del alignments[source][in_phrase]
-                    filtered_phrases.remove(in_phrase)
+                    deleted.add(in_phrase)
+                    break
 
     return alignments
 
 
+def _contains_tokens(in_tokens, out_tokens):
+    """Checks if a phrase is contained in another phrase
+
+    Whole tokens are compared, so "auf da" is not contained in
+    "auf dass"
+
+    Parameters
+    ----------
+    in_tokens : tuple
+        The tokens of the shorter phrase
+    out_tokens : tuple
+        The tokens of the longer phrase
+
+    Returns
+    -------
+    bool
+        True, if in_tokens is a contiguous part of out_tokens
+    """
+
+    length = len(in_tokens)
+    return any(out_tokens[i:i + length] == in_tokens
+               for i in range(len(out_tokens) - length + 1))
+
+
 def remove_incomplete_phrases(alignments):
     """Removes phrases of the form "à ... occasion" if a complete
     phrase ("à l' occasion") exists
@@ -205,30 +261,54 @@ def remove_incomplete_phrases(alignments):
        The alignment without the incomplete phrases
     """
 
-    filtered_alignments = deepcopy(alignments)
+    filtered_alignments = dict()
 
     for source, targets in alignments.items():
-        for target in targets.keys():
-            target_tokens = target.split()
-            if len(target_tokens) >= 3 and "..." in target:
-                for compare_target in targets.keys():
-                    target_complete = compare_target.split()
-                    clean_target = deepcopy(target_tokens)
+        complete = _index_complete_phrases(targets)
+        filtered_alignments[source] = dict()
+        for target, probability in targets.items():
+            # Only discontinuous phrases need to be split
+            if "..." in target:
+                target_tokens = target.split()
+                if len(target_tokens) >= 3:
+                    clean_target = list(target_tokens)
                     clean_target.remove("...")
-                    if len(target_complete) >= 3\
-                            and "..." not in compare_target\
-                            and target_tokens[0] == target_complete[0]\
-                            and target_tokens[-1] == target_complete[-1]\
-                            and all(map(str.isalpha, target_complete))\
-                            and clean_target != target_complete:
-                        try:
-                            del filtered_alignments[source][target]
-                        except KeyError:
-                            pass
+                    candidates = complete.get(
+                        (target_tokens[0], target_tokens[-1]), [])
+                    if any(clean_target != target_complete
+                           for _, target_complete in candidates):
+                        continue
+            filtered_alignments[source][target] = probability
 
     return filtered_alignments
 
 
+def _index_complete_phrases(phrases):
+    """Groups the complete phrases by their first and last token
+
+    Parameters
+    ----------
+    phrases : iterable
+        The phrases to index
+
+    Returns
+    -------
+    index : dict
+        (first token, last token) -> list of (phrase, tokens) for the
+        phrases with at least three alphabetic tokens and no "..."
+    """
+
+    index = defaultdict(list)
+    for phrase in phrases:
+        if "..." in phrase:
+            continue
+        tokens = phrase.split()
+        if len(tokens) >= 3 and all(map(str.isalpha, tokens)):
+            index[(tokens[0], tokens[-1])].append((phrase, tokens))
+
+    return index
+
+
 def filter_single_words(alignments, lang):
     """Removes false or incomplete (unrecognizable) alignments
 
@@ -245,17 +325,12 @@ def filter_single_words(alignments, lang):
         The filtered probability alignment
     """
 
-    if lang == "french":
-        del_words = ["dass", "wenn", "auf", "vor", "in", "mit"]
-    elif lang == "german":
-        del_words = ["avec", "dans", "devant", "par", "bien", "de",
-                     "quoi", "même", "tout", "que", "qu'", "en", "est", "ce",
-                     "sous", "qui", "s'", "si", "lors", "pendant", "durant"]
+    del_words = _SINGLE_DEL_WORDS[lang]
 
     for source in alignments.keys():
+        # The keys of a dict are already unique
         single_words = [single for single in alignments[source]
-                        if len(single.split()) == 1]
-        single_words = pd.unique(single_words).tolist()
+                        if single and " " not in single]
 
         for single in single_words:
             if single in del_words:
@@ -280,19 +355,14 @@ def remove_pronouns(alignments, lang):
         The same alignments without the phrases with pronouns
     """
 
-    if lang == "german":
-        pronouns = ["ich", "du", "er", "sie", "es", "wir", "ihr", "sie"]
-    if lang == "french":
-        pronouns = ["j'", "je", "tu", "il", "elle", "on", "nous", "vous",
-                    "ils", "elles"]
-
-    filtered_alignments = deepcopy(alignments)
+    pronouns = _PRONOUNS[lang]
 
-    for source, targets in alignments.items():
-        for target in targets.keys():
-            target_tokens = target.split()
-            if bool(set(pronouns) & set(target_tokens)):
-                del filtered_alignments[source][target]
+    # isdisjoint() stops at the first pronoun
+    filtered_alignments = {
+        source: {target: probability
+                 for target, probability in targets.items()
+                 if pronouns.isdisjoint(target.split())}
+        for source, targets in alignments.items()}
 
     return filtered_alignments
 
@@ -316,12 +386,12 @@ def remove_punct_phrases(tokens):
         Unchanged list, if the list only contains one word
     """
 
-    no_punct_phrases = tokens
     if len(tokens) > 1:
-        if tokens[0] in string.punctuation:
-            no_punct_phrases = tokens[1:]
-        if tokens[-1] in string.punctuation:
-            no_punct_phrases = no_punct_phrases[:-1]
+        # Always a new list, the tokens of the caller are not changed
+        no_punct_phrases = tokens[1:] if tokens[0] in _PUNCT\
+            else list(tokens)
+        if tokens[-1] in _PUNCT:
+            del no_punct_phrases[-1]
         if no_punct_phrases:
             # '...' was used to indicate discontinuous phrases
             # If it just separated a comma from a word and is now at
@@ -349,25 +419,41 @@ def remove_punct_values(dictionary):
         The alignment without punctuation
     """
 
-    no_punct = defaultdict(list)
-    for source, target in dictionary.items():
-        for word in target:
-            if word and word in string.punctuation:
-                no_punct[source].append("")
-            else:
-                no_punct[source].append(word)
+    # Sources without any alignment are left out
+    no_punct = {source: ["" if word in _PUNCT else word for word in target]
+                for source, target in dictionary.items() if target}
     return no_punct
 
 
 def json_to_dict(file):
     """Saves the alignment of the JSON file as a dictionary"""
 
-    with open(file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    if orjson is not None:
+        with open(file, "rb") as f:
+            data = orjson.loads(f.read())
+    else:
+        with open(file, "r", encoding="utf-8") as f:
+            data = json.load(f)
 
     return data
 
 
+@lru_cache(maxsize=4096)
+def _tokenize_fr(phrase):
+    """Tokenizes a French connective, the lower-cased variants of a
+    connective often coincide"""
+
+    return " ".join(_FR_TOKEN_RE.findall(phrase))
+
+
+@lru_cache(maxsize=4096)
+def _tokenize_de(phrase):
+    """Tokenizes a German connective, the lower-cased variants of a
+    connective often coincide"""
+
+    return " ".join(word_tokenize(phrase, language="german"))
+
+
 def read_fr_xml(doc):
     """Filters the ConnLex connectives
 
@@ -382,32 +468,31 @@ def read_fr_xml(doc):
         A list with the LexConn connectives
     """
 
-    root = ET.parse(doc).getroot()
     fr_conn = []
-    for entry in root.findall("./entry"):
+    # The entries are processed and freed one at a time
+    for _, entry in ET.iterparse(doc, events=("end",)):
+        if entry.tag != "entry":
+            continue
         # Saves all variants of a connective
         # Single words and phrases (continuous)
         singles_phrases = [variant.text.lower() for variant
                            in entry.findall("./orths/orth[@type='cont']/part")]
 
         # Tokenization: "d'abord" -> "d' abord"
-        tokenizer = RegexpTokenizer(r"\w*qu'|\w'|\w+(?:['-]\w+)*|[.,!?;]")
-        singles_phrases = [" ".join(tokenizer.tokenize(phrase))
-                           for phrase in singles_phrases]
+        singles_phrases = [_tokenize_fr(phrase) for phrase in singles_phrases]
         fr_conn += singles_phrases
 
         # Same procedure for discontinuous phrases
         for discont in entry.findall("./orths/orth[@type='discont']"):
             discontinuous = [part.text.lower() for part
                              in discont.findall("./part")]
-            tokenizer = RegexpTokenizer(r"\w*qu'|\w'|\w+(?:['-]\w+)*|[.,!?;]")
-            discontinuous = [" ".join(tokenizer.tokenize(phrase))
-                             for phrase in discontinuous]
+            discontinuous = [_tokenize_fr(phrase) for phrase in discontinuous]
             discontinuous = " ... ".join(discontinuous)
             fr_conn.append(discontinuous)
+        entry.clear()
 
     # Removes doubles which exist because everything is lower-case now
-    fr_conn = pd.unique(fr_conn).tolist()
+    fr_conn = list(dict.fromkeys(fr_conn))
 
     return fr_conn
 
@@ -427,28 +512,29 @@ def read_de_xml(doc):
     """
 
     de_conn = []
-    root = ET.parse(doc).getroot()
-    for entry in root.findall("./entry"):
+    # The entries are processed and freed one at a time
+    for _, entry in ET.iterparse(doc, events=("end",)):
+        if entry.tag != "entry":
+            continue
         # Saves all variants of a connective
         # Single words and phrases (continuous)
         singles_phrases = [variant.text.lower() for variant
                            in entry.findall("./orths/orth[@type='cont']/part")]
 
-        singles_phrases = [" ".join(word_tokenize(phrase, language="german"))
-                           for phrase in singles_phrases]
+        singles_phrases = [_tokenize_de(phrase) for phrase in singles_phrases]
         de_conn += singles_phrases
 
         # Same procedure for discontinuous phrases
         for discont in entry.findall("./orths/orth[@type='discont']"):
             discontinuous = [part.text.lower() for part
                              in discont.findall("./part")]
-            discontinuous = [" ".join(word_tokenize(phrase, language="german"))
-                             for phrase in discontinuous]
+            discontinuous = [_tokenize_de(phrase) for phrase in discontinuous]
             discontinuous = " ... ".join(discontinuous)
             de_conn.append(discontinuous)
+        entry.clear()
 
     # Removes doubles (because everything is lower-case now)
-    de_conn = pd.unique(de_conn).tolist()
+    de_conn = list(dict.fromkeys(de_conn))
     de_conn.remove("z.b .")
     de_conn.remove("z.bsp .")
     de_conn.remove("d.h .")
@@ -462,6 +548,8 @@ def read_de_xml(doc):
 def save_alignments(file_name, content):
     """Saves a dictionary as a JSON file"""
 
+    # Always written with the json module, orjson only supports an
+    # indentation of two spaces
     with open(file_name, "w",
               encoding="utf-8") as file:
         json.dump(content, file, indent=4,
@@ -522,26 +610,25 @@ def complete_phrases(alignments, lex):
        The alignment with completed phrases
     """
 
-    filtered = deepcopy(alignments)
+    filtered = dict()
+    complete = _index_complete_phrases(lex)
 
     for source, targets in alignments.items():
+        filtered[source] = dict(targets)
         for target in targets.keys():
+            if "..." not in target:
+                continue
             target_tokens = target.split()
-            if len(target_tokens) >= 3 and "..." in target:
-                for compare_conn in lex:
-                    target_complete = compare_conn.split()
-                    clean_target = deepcopy(target_tokens)
-                    clean_target.remove("...")
-                    if len(target_complete) >= 3\
-                            and "..." not in compare_conn\
-                            and target_tokens[0] == target_complete[0]\
-                            and target_tokens[-1] == target_complete[-1]\
-                            and all(map(str.isalpha, target_complete))\
-                            and clean_target != target_complete:
-                        try:
-                            probability = filtered[source].pop(target)
-                            filtered[source][compare_conn] = probability
-                        except KeyError:
-                            pass
+            if len(target_tokens) >= 3:
+                clean_target = list(target_tokens)
+                clean_target.remove("...")
+                candidates = complete.get(
+                    (target_tokens[0], target_tokens[-1]), [])
+                # The first matching connective of the lexicon is used
+                for compare_conn, target_complete in candidates:
+                    if clean_target != target_complete:
+                        probability = filtered[source].pop(target)
+                        filtered[source][compare_conn] = probability
+                        break
 
     return filtered